@@ -727,16 +727,18 @@ TRACKER_JS= """
             activityEvents.forEach(event => { document.addEventListener(event, () => { this.onUserActivity(); }, { passive: true }); });
 
             // chunk-based scroll depth tracking
-            const TOTAL_CHUNKS = 500; // 1,000,000 / 2,000
             let chunksLoaded = 0;
-            document.addEventListener('htmx:afterRequest', (e) => {
-                if (e.detail.pathInfo?.requestPath?.includes('/chunk/')) {
+            const onChunkLoaded = () => {
+                    const grid = document.getElementById('grid-container')?.dataset || {}; // board size is configurable
+                    const totalChunks = Math.ceil((+grid.total || 1000000) / (+grid.chunk || 2000));
                     chunksLoaded++;
-                    const depth = Math.round((chunksLoaded / TOTAL_CHUNKS) * 100);
+                    const depth = Math.round((chunksLoaded / totalChunks) * 100);
                     this.scrollDepth = Math.max(this.scrollDepth, depth);
                     fetch('/track-scroll', { method: 'POST', headers: {'Content-Type': 'application/json'}, 
                         body: JSON.stringify({depth: depth}) 
-                    }).catch(err => console.log('Scroll tracking failed:', err)); } });
+                    }).catch(err => console.log('Scroll tracking failed:', err)); };
+            document.addEventListener('htmx:afterRequest', (e) => { if (e.detail.pathInfo?.requestPath?.includes('/chunk/')) onChunkLoaded(); });
+            document.addEventListener('grid:chunk-loaded', onChunkLoaded); // chunks rendered client-side from /chunk-bits
 
             window.addEventListener('beforeunload', () => { this.endSession(); });
 
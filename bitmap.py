@@ -0,0 +1,102 @@
+"""Helpers for working with the Redis checkbox bitmap in Python"""
+
+# Redis numbers bits MSB-first: bit offset 0 is the high bit of byte 0
+BYTE_BITS = tuple(tuple(bool(b >> (7 - k) & 1) for k in range(8)) for b in range(256))
+
+def byte_span(start_idx: int, end_idx: int):
+    """Inclusive byte range (for GETRANGE) covering bits [start_idx, end_idx)"""
+    return start_idx // 8, (end_idx - 1) // 8
+
+def unpack_bits(data: bytes, start_idx: int, end_idx: int, first_byte: int = None) -> list:
+    """Decode bits [start_idx, end_idx) from `data`, which starts at byte `first_byte` of the bitmap.
+    Missing trailing bytes (Redis trims GETRANGE at the key length) decode as unchecked."""
+    first_byte = start_idx // 8 if first_byte is None else first_byte
+    n_bytes = (end_idx - 1) // 8 - first_byte + 1
+    data = bytes(data or b"").ljust(n_bytes, b"\x00")
+    bits = [bit for b in data[:n_bytes] for bit in BYTE_BITS[b]]
+    skip = start_idx - first_byte * 8
+    return bits[skip: skip + (end_idx - start_idx)]
+
+class BitmapMirror:
+    """In-process copy of the Redis bitmap packed into a bytearray (1 bit per checkbox, same layout as Redis)"""
+    def __init__(self, n_bits: int):
+        self.n_bits = n_bits
+        self.buf = bytearray((n_bits + 7) // 8)
+        self.loaded = False
+
+    def load(self, data: bytes, first_byte: int = 0, n_bytes: int = None):
+        """Replace `n_bytes` of the mirror starting at `first_byte` (default: all of it) with a raw Redis bitmap value"""
+        n_bytes = len(self.buf) - first_byte if n_bytes is None else n_bytes
+        self.buf[first_byte:first_byte + n_bytes] = bytes(data or b"")[:n_bytes].ljust(n_bytes, b"\x00")
+        self.loaded = True
+
+    def get(self, i: int) -> bool:
+        return bool(self.buf[i >> 3] >> (7 - (i & 7)) & 1)
+
+    def set(self, i: int, val: bool):
+        if val: self.buf[i >> 3] |= 0x80 >> (i & 7)
+        else: self.buf[i >> 3] &= ~(0x80 >> (i & 7)) & 0xFF
+
+    def range(self, start_idx: int, end_idx: int) -> list:
+        first_byte, last_byte = byte_span(start_idx, end_idx)
+        return unpack_bits(self.buf[first_byte:last_byte + 1], start_idx, end_idx, first_byte)
+
+    def span(self, start_idx: int, end_idx: int) -> bytes:
+        """Raw packed bytes covering bits [start_idx, end_idx), start_idx is expected to be byte aligned"""
+        first_byte, last_byte = byte_span(start_idx, end_idx)
+        return bytes(self.buf[first_byte:last_byte + 1])
+
+    def popcount(self) -> int:
+        return int.from_bytes(self.buf, "big").bit_count()
+
+class ShardedBitmap:
+    """Key layout of a board split into `shard_bits`-bit Redis keys, so no single key is hot on 10M/100M boards.
+    Each shard has its own bitmap, checked counter and chunk versions hash; shard 0 keeps the original key names."""
+    def __init__(self, n_bits: int, shard_bits: int, bitmap_key: str = "checkboxes_bitmap",
+                 count_key: str = "checkboxes_checked_count", versions_key: str = "checkboxes_chunk_versions"):
+        if shard_bits % 8: raise ValueError("shard_bits must be a multiple of 8 so shards start on a byte")
+        self.n_bits, self.shard_bits = n_bits, shard_bits
+        self.n_shards = (n_bits + shard_bits - 1) // shard_bits
+        self._keys = [tuple(k if s == 0 else f"{k}:{s}" for k in (bitmap_key, count_key, versions_key)) for s in range(self.n_shards)]
+
+    def locate(self, i: int):
+        """Global checkbox index -> (shard, bit offset inside that shard's key)"""
+        return divmod(i, self.shard_bits)
+
+    def keys(self, shard: int):
+        """(bitmap key, checked counter key, chunk versions key) of one shard, in the order the Lua scripts take them"""
+        return self._keys[shard]
+
+    def shard_bytes(self, shard: int):
+        """(first byte in the global bitmap, byte length) of a shard"""
+        return shard * self.shard_bits // 8, (min(self.shard_bits, self.n_bits - shard * self.shard_bits) + 7) // 8
+
+# KEYS: bitmap, checked counter, chunk versions hash | ARGV: bit offset, chunk index, channel, origin, global index
+# -> {new bit value, new checked count, new chunk version}; published from inside the script so messages are in flip order
+TOGGLE_LUA = """
+local v = redis.call('BITFIELD', KEYS[1], 'OVERFLOW', 'WRAP', 'INCRBY', 'u1', ARGV[1], 1)[1]
+local c = redis.call('INCRBY', KEYS[2], v == 1 and 1 or -1)
+local ver = redis.call('HINCRBY', KEYS[3], ARGV[2], 1)
+redis.call('PUBLISH', ARGV[3], ARGV[4] .. ':' .. ARGV[5] .. ':' .. v .. ':' .. c .. ':' .. ver)
+return {v, c, ver}
+"""
+
+# KEYS: bitmap, checked counter -> authoritative count, written back to the counter atomically (not created for a never toggled bitmap)
+RECOUNT_LUA = """
+local c = redis.call('BITCOUNT', KEYS[1])
+if c > 0 or redis.call('EXISTS', KEYS[2]) == 1 then redis.call('SET', KEYS[2], c) end
+return c
+"""
+
+# Write-behind flush of one toggle, last writer wins | KEYS: bitmap, checked counter, chunk versions hash
+# ARGV: bit offset, value (0/1), chunk index, channel, origin, global index -> {changed, checked count, chunk version}; publishes like a toggle
+SET_LUA = """
+local old = redis.call('SETBIT', KEYS[1], ARGV[1], ARGV[2])
+if old == tonumber(ARGV[2]) then
+    return {0, tonumber(redis.call('GET', KEYS[2]) or 0), tonumber(redis.call('HGET', KEYS[3], ARGV[3]) or 0)}
+end
+local c = redis.call('INCRBY', KEYS[2], ARGV[2] == '1' and 1 or -1)
+local ver = redis.call('HINCRBY', KEYS[3], ARGV[3], 1)
+redis.call('PUBLISH', ARGV[4], ARGV[5] .. ':' .. ARGV[6] .. ':' .. ARGV[2] .. ':' .. c .. ':' .. ver)
+return {1, c, ver}
+"""
@@ -0,0 +1,106 @@
+"""Independent boards (rooms) served by one deployment, each with its own keys and lazily loaded local state"""
+import re, time
+from collections import OrderedDict
+import bitmap, realtime, config, persistence
+
+DEFAULT_BOARD = "main" #served at the site root with the original Redis keys and volume paths
+REGISTRY_KEY = "boards" #Redis set of created board ids (the default board always exists)
+BOARD_ID_RE = re.compile(r"[a-z0-9][a-z0-9_\-]{0,31}") #goes into URLs, key names, paths and the ':'-separated pub/sub message
+#the escaped '-' keeps the pattern valid as an HTML pattern attribute too (compiled with the v flag)
+
+def valid_board_id(board_id: str) -> bool:
+    return bool(BOARD_ID_RE.fullmatch(board_id or ""))
+
+class Board:
+    """One board's Redis keys and in-process state (mirror, rendered chunks, toggle log, clients, counters, chunk versions).
+    Created on the first request for the board and dropped again when idle, so a container's memory follows the boards in use."""
+    def __init__(self, board_id: str, n_bits: int, shard_bits: int, container_id: str):
+        default = board_id == DEFAULT_BOARD
+        self.id, self.url = board_id, "" if default else f"/b/{board_id}" #route prefix for every link rendered for this board
+        keys = ("checkboxes_bitmap", "checkboxes_checked_count", "checkboxes_chunk_versions")
+        self.shards = bitmap.ShardedBitmap(n_bits, shard_bits, *(keys if default else (f"board:{board_id}:{k}" for k in keys)))
+        self.mirror = bitmap.BitmapMirror(n_bits)
+        self.toggle_log = realtime.ToggleLog(config.TOGGLE_LOG_SIZE) #shared by every client of this board, replaces per-client diff lists
+        self.clients = OrderedDict() #client id -> Client, oldest heartbeat first
+        self.checked_counter = {"value": 0, "shards": [0] * self.shards.n_shards} #per-shard Redis counters and their sum
+        self.chunk_versions = {"epochs": [""] * self.shards.n_shards, "chunks": {}} #chunk index -> toggle count, used as ETags
+        self.chunk_html_cache = OrderedDict() #offset -> rendered chunk markup (client independent), LRU bounded by CHUNK_CACHE_SIZE
+        self.stats_snapshot = {"html": None, "ts": 0.0, "refresh": None} #shared /stats fragment, at most one refresh in flight
+        self.pending_writes = [] #write-behind queue of (index, value) in toggle order
+        self.stale_chunks = {} #chunk index -> [(version, index, value)] held back while the chunk is re-read after a version gap
+        self.snapshot_path = persistence.BITMAP_SNAPSHOT_PATH if default else f"{persistence.BOARDS_DIR}/{board_id}/bitmap_snapshot.bin"
+        self.journal = persistence.ToggleJournal(container_id, persistence.JOURNAL_DIR if default else f"{persistence.BOARDS_DIR}/{board_id}/toggle_journal")
+        self.snapshot_seq = 0 #toggle_log.seq covered by the last snapshot
+        self.loading, self.last_used = None, time.time() #task filling the state from Redis, awaited by every request
+
+    def set_shard_count(self, shard: int, count: int):
+        self.checked_counter["value"] += count - self.checked_counter["shards"][shard]
+        self.checked_counter["shards"][shard] = count
+
+    def apply_toggle(self, i: int, val: bool, version: int, skip_client_id: str = None) -> bool:
+        """Make a toggle visible locally: mirror, chunk version, cached chunk markup and the shared toggle log.
+        A chunk's versions must be applied one by one; on a gap (toggles from other containers or concurrent requests
+        overtaking each other) the toggle is held back and False is returned: the caller re-reads the chunk (finish_refresh)"""
+        if version is not None and (step := self._sequence(i, val, version)) is not True: return step is None
+        self.mirror.set(i, val)
+        self.chunk_html_cache.pop(i // config.LOAD_MORE_SIZE * config.LOAD_MORE_SIZE, None)
+        self.toggle_log.append(i, origin=skip_client_id)
+        return True
+
+    def confirm_write(self, i: int, val: bool, version: int) -> bool:
+        """Record the chunk version of a write-behind toggle that is already applied locally; False on a gap, like apply_toggle.
+        A re-read of the chunk while the toggle was being sent lost it from the mirror: set it again unless a newer one is queued"""
+        if (step := self._sequence(i, val, version)) and self.mirror.get(i) != val and all(j != i for j, _ in self.pending_writes):
+            self.mirror.set(i, val)
+            self.chunk_html_cache.pop(i // config.LOAD_MORE_SIZE * config.LOAD_MORE_SIZE, None)
+            self.toggle_log.append(i)
+        return step is not False
+
+    def _sequence(self, i: int, val: bool, version: int):
+        """True: `version` is the chunk's next one, apply it. None: nothing to do (held back, or covered by a re-read).
+        False: versions are missing in between or went backwards (Redis lost the versions hash, e.g. restarted without
+        its data), the toggle is held back until the chunk is re-read"""
+        chunk = i // config.LOAD_MORE_SIZE
+        if (held := self.stale_chunks.get(chunk)) is not None: held.append((version, i, val)); return None
+        known = self.chunk_versions["chunks"].get(chunk, 0)
+        if version == known: return None
+        if version != known + 1: self.stale_chunks[chunk] = [(version, i, val)]; return False
+        self.chunk_versions["chunks"][chunk] = version
+        return True
+
+    def finish_refresh(self, chunk: int, data: bytes, version: int) -> bool:
+        """Install a chunk re-read from Redis (its bytes as of `version`), replay what was held back meanwhile and
+        push every box that changed to the clients. False if the held toggles still have a gap (re-read again)"""
+        start = chunk * config.LOAD_MORE_SIZE
+        end = min(start + config.LOAD_MORE_SIZE, len(self.mirror.buf) * 8)
+        before = self.mirror.range(start, end)
+        self.mirror.load(data, start // 8, (end - start + 7) // 8)
+        held = [t for t in sorted(self.stale_chunks.pop(chunk, [])) if t[0] > version] #Redis' version wins, also when it went backwards
+        while held and held[0][0] == version + 1:
+            version, i, val = held.pop(0); self.mirror.set(i, val)
+        for i, val in self.pending_writes: #write-behind toggles Redis hasn't seen yet, newer than anything above
+            if start <= i < end: self.mirror.set(i, val)
+        if held: self.stale_chunks[chunk] = held #a version between the re-read and these is still in flight
+        self.chunk_versions["chunks"][chunk] = version
+        self.chunk_html_cache.pop(start, None)
+        for i, (old, new) in enumerate(zip(before, self.mirror.range(start, end)), start=start):
+            if old != new: self.toggle_log.append(i)
+        return not held
+
+    def finish_reload(self, before: bytes):
+        """After the whole board was re-read from Redis (load_chunk_versions, then the mirror) over the old mirror `before`:
+        re-apply the write-behind queue and push every box that changed to the clients (chunks being re-read finish on their own)"""
+        for i, val in self.pending_writes: self.mirror.set(i, val)
+        self.chunk_html_cache.clear()
+        n_bits, size = self.mirror.n_bits, config.LOAD_MORE_SIZE
+        for start in range(0, n_bits, size):
+            end = min(start + size, n_bits); old = before[start // 8:(end + 7) // 8]
+            if old == self.mirror.span(start, end): continue
+            for i, (was, now) in enumerate(zip(bitmap.unpack_bits(old, start, end), self.mirror.range(start, end)), start=start):
+                if was != now: self.toggle_log.append(i)
+
+    def is_idle(self, now: float, timeout: float = config.BOARD_IDLE_TIMEOUT) -> bool:
+        return self.id != DEFAULT_BOARD and not self.clients and now - self.last_used > timeout
+
+    def changed_since_snapshot(self) -> bool:
+        return self.toggle_log.seq != self.snapshot_seq
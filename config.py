@@ -1,9 +1,45 @@
-import pytz
+import os, pytz
 from typing import Dict, List, Tuple
 
 LOCAL_TIMEZONE = pytz.timezone("America/Chicago")
 
 CLIENT_GEO_TTL = 300.0
+# Shared Redis endpoint for all containers, e.g. redis://:password@host:6379/0 (unset -> embedded per-container redis-server)
+REDIS_URL = os.environ.get("REDIS_URL") or None
+REDIS_STARTUP_TIMEOUT = 120.0 #seconds to wait for Redis to answer PING (a large RDB can keep it LOADING for a while)
+# Write-behind toggles: flip the local mirror at once, flush to Redis in pipelined batches every WRITE_BEHIND_FLUSH_MS
+WRITE_BEHIND = os.environ.get("WRITE_BEHIND", "").lower() in ("1", "true", "yes")
+WRITE_BEHIND_FLUSH_MS = 5
+# Toggle rate limits (token buckets): burst size and refill per second, per tab and per IP (several tabs / NAT share an IP)
+TOGGLE_CLIENT_BURST, TOGGLE_CLIENT_RATE = 20, 10.0
+TOGGLE_IP_BURST, TOGGLE_IP_RATE = 60, 30.0
+RATE_LIMIT_SHARED = os.environ.get("RATE_LIMIT_SHARED", "").lower() in ("1", "true", "yes") #also enforce the buckets across containers in Redis
+SNAPSHOT_INTERVAL = 30.0 #seconds between bitmap snapshots to the volume (only when something changed)
+JOURNAL_FLUSH_INTERVAL = 0.2 #seconds between fsyncs of the toggle journal, bounds how many toggles a crash can lose
+SSE_KEEPALIVE = 15.0 #seconds between keepalive frames on an idle /events stream
+# Every open tab holds one /events stream, i.e. one of the container's concurrent inputs for as long as it is open
+MAX_CONCURRENT_INPUTS = 5000 #@modal.concurrent limit per container, idle streams are cheap (one parked coroutine each)
+SSE_MAX_STREAMS = 3000 #open streams per container; past this /events answers 204 and the tab keeps polling, leaving inputs for toggles and pages
+SSE_COALESCE = 0.1 #seconds a woken /events stream waits for more toggles before sending, so a burst of toggles wakes each stream once, not once per toggle
+SSE_RETRY_MS = 3000 #EventSource reconnect delay after a dropped stream; a container that doesn't know the client answers 204 and the tab polls
+COUNT_RECONCILE_INTERVAL = 60.0 #seconds between BITCOUNT reconciliations of the checked counter
+STATS_SNAPSHOT_TTL = 0.25 #seconds a rendered /stats fragment is shared between requests
+CHUNK_CACHE_SIZE = 64 #rendered 2,000-box chunks kept in memory (~150KB each)
+TOGGLE_LOG_SIZE = 10000 #recent toggles kept in the shared ring clients read their diffs from
+MAX_VIEWPORT_CHUNKS = 128 #cap on chunk offsets one client may subscribe to through /viewport
+CLIENT_REAP_INTERVAL = 5.0 #seconds between sweeps that evict clients past their inactivity deadline
+MAX_CLIENT_DIFFS = 500 #pending diffs per client before it is told to resync instead
+# Board size (e.g. 10_000_000 or 100_000_000 for the bigger variants), split into BITMAP_SHARD_BITS-bit Redis keys
+N_CHECKBOXES = int(os.environ.get("N_CHECKBOXES") or 1_000_000)
+LOAD_MORE_SIZE = 2000 #checkboxes per rendered chunk
+BITMAP_SHARD_BITS = 1_000_000 #bits per bitmap key (125KB), a multiple of LOAD_MORE_SIZE and of 8 so chunks and bytes never straddle shards
+assert BITMAP_SHARD_BITS % LOAD_MORE_SIZE == 0 and BITMAP_SHARD_BITS % 8 == 0
+# Boards (rooms): every board but the default lives under /b/<board id>, loaded into a container on first use
+BOARD_IDLE_TIMEOUT = 300.0 #seconds without requests or live clients before a board's local state is dropped (its data stays in Redis)
+BOARD_EVICT_INTERVAL = 30.0 #seconds between sweeps for idle boards
+MAX_LOADED_BOARDS = 50 #boards held in one container at a time; when full the least recently used board without live clients is dropped
+MAX_BOARDS = 1000 #boards that can be created (POST /boards), unknown ids are a 404 and never touch Redis
+BOARD_CREATE_BURST, BOARD_CREATE_RATE = 3, 1 / 600 #board creations per IP: burst, then one per 10 minutes
 LOCAL_TIMEZONE = pytz.timezone("America/Chicago")
 
 BOTS = { "googlebot":"Googlebot","bingbot":"Bingbot","twitterbot":"Twitterbot","facebookexternalhit":"FacebookBot",
@@ -1,5 +1,5 @@
-import time,asyncio,subprocess, modal
-from asyncio import Lock
+import os,time,json,asyncio,subprocess, modal
+from collections import OrderedDict
 from pathlib import Path
 from fasthtml.js import NotStr
 import fasthtml.common as fh
@@ -7,10 +7,12 @@ from redis.asyncio import Redis
 from uuid import uuid4
 import logging
 from logging.handlers import RotatingFileHandler
-import geo, config, persistence, analytics
+from starlette.responses import StreamingResponse, Response, JSONResponse, RedirectResponse
+import geo, config, persistence, analytics, bitmap, realtime, ratelimit, boards
 
-checkboxes_bitmap_key, checkbox_cache, clients, clients_mutex= "checkboxes_bitmap", {}, {}, Lock()
-N_CHECKBOXES, LOAD_MORE_SIZE = 1000000, 2000
+N_CHECKBOXES, LOAD_MORE_SIZE = config.N_CHECKBOXES, config.LOAD_MORE_SIZE
+loaded_boards = OrderedDict() #board id -> boards.Board held by this container, least recently used first
+toggles_channel, CONTAINER_ID = "checkbox_toggles", uuid4().hex[:12] #pub/sub fan-out across containers, origin id to skip our own messages
 
 css_path_local = Path(__file__).parent / "style_v2.css"
 css_path_remote = "/assets/style_v2.css"
@@ -26,7 +28,7 @@ app_image = (modal.Image.debian_slim(python_version="3.12")
     .pip_install("python-fasthtml==0.12.36", "httpx==0.27.0" ,"redis>=5.3.0", "pytz", "aiosqlite","markdown==3.10.2")
     .apt_install("redis-server").add_local_file(css_path_local,remote_path=css_path_remote, )
     .add_local_file("static/blog.html", remote_path="/root/static/blog.html")
-    .add_local_python_source("utils","geo", "config", "fasthtml_components", "persistence", "analytics") )# This is the key: it adds utils.py and makes it importable
+    .add_local_python_source("utils","geo", "config", "fasthtml_components", "persistence", "analytics", "bitmap", "realtime", "ratelimit", "boards") )# This is the key: it adds utils.py and makes it importable
 
 def setup_logging():
     """Setup file and console logging + capture print statements"""
@@ -57,51 +59,356 @@ def setup_logging():
     builtins.print = logged_print
     return logger
 
+def wait_for_redis(url: str, process=None, log_path: str = None):
+    """Block until Redis answers PING: retry with backoff while it is starting or still LOADING the dataset,
+    fail fast (with the tail of its log) if the embedded process exits, give up after config.REDIS_STARTUP_TIMEOUT"""
+    import redis as redis_sync
+    client, start, delay, state = redis_sync.Redis.from_url(url), time.time(), 0.01, "starting"
+    while True:
+        if process is not None and process.poll() is not None:
+            tail = Path(log_path).read_text()[-2000:] if log_path and Path(log_path).exists() else ""
+            raise RuntimeError(f"redis-server exited with code {process.returncode} during startup:\n{tail}")
+        try:
+            client.ping()
+            print(f"[REDIS] Ready after {(time.time() - start) * 1000:.0f} ms")
+            return client.close()
+        except redis_sync.exceptions.BusyLoadingError: state = "loading dataset" #subclass of ConnectionError, check first
+        except redis_sync.exceptions.ConnectionError: state = "not accepting connections"
+        if time.time() - start > config.REDIS_STARTUP_TIMEOUT:
+            raise TimeoutError(f"Redis not ready after {config.REDIS_STARTUP_TIMEOUT:.0f}s ({state})")
+        time.sleep(delay); delay = min(delay * 2, 0.5)
+
 @app.function( 
-    image = app_image, max_containers=3, volumes={"/data": volume, LOGS_DIR: logs_volume }, timeout=3600,) #keep_warm=1,
+    image = app_image, max_containers=3, volumes={"/data": volume, LOGS_DIR: logs_volume }, timeout=3600, #keep_warm=1,
+    secrets=[modal.Secret.from_dict({k: os.environ.get(k, "") for k in ("REDIS_URL", "WRITE_BEHIND", "RATE_LIMIT_SHARED", "N_CHECKBOXES")})],) #captured at deploy time
 
-@modal.concurrent(max_inputs=1000)
+@modal.concurrent(max_inputs=config.MAX_CONCURRENT_INPUTS) #headroom above SSE_MAX_STREAMS for toggles and page loads
 @modal.asgi_app()
 def web():# Start redis server locally inside the container (persisted to volume)
+    cold_start = {"boot": time.time(), "ready": None, "first_served": set()} #time-to-ready + first request latencies per path
     logger = setup_logging()
     logger.info("=" * 60)
     logger.info("🚀 One Million Checkboxes App Starting")
     logger.info("=" * 60)
 
-    redis_process = subprocess.Popen(
-        [   "redis-server", "--protected-mode", "no", "--bind","127.0.0.1", "--port", "6379", "--dir", "/data", #store data in persistent volume
-            "--save", "60", "1","--save", "" ] #save every minute, if 1 change, #disable all other automatic saves
-        , stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL )
-    time.sleep(1)
+    redis_process = None
+    redis_persisted = {"saved": 0.0, "started": time.time(), "run_id": ""} #toggles journaled between saved and started were lost by Redis
+    if config.REDIS_URL: #shared Redis: every container sees the same bitmap and pub/sub channel
+        wait_for_redis(config.REDIS_URL)
+        redis = Redis.from_url(config.REDIS_URL)
+        print("Using shared Redis endpoint from REDIS_URL")
+    else: #single-node fallback: private redis-server inside this container
+        rdb_path = Path("/data/dump.rdb") #LASTSAVE reads as the start time after a restart, the file says how old the loaded data is
+        redis_persisted.update(saved=rdb_path.stat().st_mtime if rdb_path.exists() else 0.0, started=time.time())
+        redis_process = subprocess.Popen(
+            [   "redis-server", "--protected-mode", "no", "--bind","127.0.0.1", "--port", "6379", "--dir", "/data", #store data in persistent volume
+                "--save", "60", "1","--save", "" ] #save every minute, if 1 change, #disable all other automatic saves
+            , stdout=(redis_log := open(f"{LOGS_DIR}/redis-server.log", "ab")), stderr=subprocess.STDOUT )
+        wait_for_redis("redis://127.0.0.1:6379", redis_process, redis_log.name)
+
+        redis = Redis.from_url("redis://127.0.0.1:6379")
+        print("Redis server started succesfully with persistent storage")
+    toggle_script, recount_script, set_script = (redis.register_script(bitmap.TOGGLE_LUA), redis.register_script(bitmap.RECOUNT_LUA),
+                                                 redis.register_script(bitmap.SET_LUA))
+    bucket_script = redis.register_script(ratelimit.SHARED_BUCKET_LUA)
+    client_limiter = ratelimit.TokenBucketLimiter(config.TOGGLE_CLIENT_BURST, config.TOGGLE_CLIENT_RATE)
+    ip_limiter = ratelimit.TokenBucketLimiter(config.TOGGLE_IP_BURST, config.TOGGLE_IP_RATE)
+    board_create_limiter = ratelimit.TokenBucketLimiter(config.BOARD_CREATE_BURST, config.BOARD_CREATE_RATE)
 
-    redis = Redis.from_url("redis://127.0.0.1:6379")
-    print("Redis server started succesfully with persistent storage")
-    
     async def startup_migration():
         await persistence.init_sqlite_db()
+        info = await redis.info("server")
+        redis_persisted["run_id"] = info["run_id"]
+        if not redis_process: #shared Redis: it was (re)started on its own, when its last save was is all we can know
+            redis_persisted.update(saved=(await redis.lastsave()).timestamp(), started=time.time() - int(info["uptime_in_seconds"]))
         if not (redis_count := await redis.get("total_visitors_count"))or int(redis_count) == 0:
             sqlite_count = await persistence.get_visitor_count_sqlite()
             if sqlite_count > 0: print(f"[STARTUP] Redis empty, restoring {sqlite_count} visitors from SQLite...")
-        await redis.setbit(checkboxes_bitmap_key, N_CHECKBOXES - 1, 0)
-        print("[STARTUP] Bitmap initialized/verified,... Migration check complete")
-       
-    async def get_checkbox_range_cached(start_idx: int, end_idx:int):
-        """ Load a specific range of chekcboxes, with caching"""
-        missing = [i for i in range(start_idx, end_idx) if i not in checkbox_cache]
-        if missing:
+        if isinstance(await open_board(boards.DEFAULT_BOARD), Response): #loaded up front, every other board on its first request
+            raise RuntimeError("default board failed to load")
+        print("[STARTUP] Default board initialized/verified,... Migration check complete")
+
+    async def open_board(board_id: str):
+        """The loaded board for `board_id`, loading it from Redis on first use; an error Response for an id that was never created
+        (POST /boards) or a container whose board slots all have live clients"""
+        if not boards.valid_board_id(board_id): return Response("unknown board", status_code=404)
+        if (board := loaded_boards.get(board_id)) is None:
+            if board_id != boards.DEFAULT_BOARD and not await redis.sismember(boards.REGISTRY_KEY, board_id): return Response("unknown board", status_code=404)
+            if len(loaded_boards) >= config.MAX_LOADED_BOARDS: await evict_idle_boards(need_slot=True)
+        if (board := loaded_boards.get(board_id)) is None: #another first request may have created it during the awaits above
+            if len(loaded_boards) >= config.MAX_LOADED_BOARDS: return Response("Too many active boards, try again later", status_code=503, headers={"Retry-After": "30"})
+            board = loaded_boards[board_id] = boards.Board(board_id, N_CHECKBOXES, config.BITMAP_SHARD_BITS, CONTAINER_ID)
+            board.loading = asyncio.create_task(load_board(board))
+        loaded_boards.move_to_end(board_id); board.last_used = time.time()
+        try: await asyncio.shield(board.loading) #concurrent first requests share one load, a disconnect doesn't cancel it
+        except Exception as e:
+            if loaded_boards.get(board_id) is board: del loaded_boards[board_id] #the next request retries
+            print(f"[BOARD ERROR] Loading {board_id}: {e}")
+            return Response("board unavailable", status_code=503)
+        return board
+
+    async def load_board(board):
+        """Bitmap shards (restored from the volume if missing), mirror, counters and chunk versions of one board"""
+        start, pipe = time.time(), redis.pipeline()
+        for shard in range(board.shards.n_shards): pipe.exists(board.shards.keys(shard)[0])
+        await restore_bitmap_from_snapshot(board, {shard for shard, found in enumerate(await pipe.execute()) if not found})
+        if board.id == boards.DEFAULT_BOARD: #full-size shard keys, as the original board always had; other boards' keys grow with their toggles
             pipe = redis.pipeline()
-            for idx in missing: pipe.getbit(checkboxes_bitmap_key, idx)
-            for idx, res in zip(missing, await pipe.execute()): checkbox_cache[idx] = bool(res)
-        return [checkbox_cache[i] for i in range(start_idx, end_idx)]
-         
-    async def get_status():
-        """ Get checked/unchecked counts - use redis directly, not cache"""
-        checked = await redis.bitcount(checkboxes_bitmap_key)
+            for shard in range(board.shards.n_shards): pipe.setbit(board.shards.keys(shard)[0], board.shards.shard_bytes(shard)[1] * 8 - 1, 0)
+            await pipe.execute()
+        await load_chunk_versions(board) #before the bits: a toggle in between is then replayed (idempotent) instead of skipped as already seen
+        await load_bitmap_mirror(board)
+        await reconcile_checked_count(board)
+        board.snapshot_seq = board.toggle_log.seq
+        print(f"[BOARD] Loaded {board.id} in {(time.time() - start) * 1000:.0f} ms: {board.checked_counter['value']:,} checked, "
+              f"{len(loaded_boards)} board(s) in this container")
+
+    async def evict_idle_boards(need_slot: bool = False):
+        """Drop the local state of boards nobody has used for BOARD_IDLE_TIMEOUT (with `need_slot`, at least the least recently used board
+        without live clients, so one-off visits can't hold every slot); their data stays in Redis and on the volume"""
+        now = time.time()
+        idle = [b for b in loaded_boards.values() if b.is_idle(now)]
+        if need_slot and not idle: idle = [b for b in loaded_boards.values() if b.is_idle(now, timeout=0)][:1] #loaded_boards is LRU ordered
+        for board in idle:
+            if loaded_boards.pop(board.id, None) is not board: continue #first, so new requests load a fresh copy instead of using this one
+            await flush_pending_writes(board)
+            if board.changed_since_snapshot(): #an untouched board has nothing new to write to the volume
+                try: await snapshot_bitmap(board)
+                except Exception as e: print(f"[SNAPSHOT ERROR] {board.id}: {e}")
+            print(f"[BOARD] Evicted idle board {board.id}, {len(loaded_boards)} board(s) left in this container")
+
+    async def board_evictor():
+        while True:
+            await asyncio.sleep(config.BOARD_EVICT_INTERVAL)
+            try: await evict_idle_boards()
+            except Exception as e: print(f"[BOARD ERROR] {e}")
+
+    async def restore_bitmap_from_snapshot(board, missing: set):
+        """Recover toggles Redis lost from the volume (no RDB needed). Missing shard keys, and with the embedded server shards whose RDB
+        is older than the snapshot, are rebuilt from the snapshot + journaled toggles after it. Shards Redis reloaded from its RDB replay the
+        toggles journaled between that save and the Redis start (a crash or preemption lost them), once per Redis process."""
+        data, taken_at = persistence.load_bitmap_snapshot(board.snapshot_path)
+        saved_at, started_at, shards = redis_persisted["saved"], redis_persisted["started"], board.shards
+        entries = persistence.read_journal_entries(min(taken_at, saved_at), str(board.journal.path.parent))
+        if data is None and not entries: return #never toggled (or nothing on the volume yet): write nothing to Redis
+        recover = await redis.getset(f"{shards.keys(0)[0]}:recovered_by", redis_persisted["run_id"]) != redis_persisted["run_id"].encode()
+        from_snapshot = {shard for shard in range(shards.n_shards) if data and len(data) > shards.shard_bytes(shard)[0]
+                         and (shard in missing or (recover and redis_process and taken_at > saved_at))} #embedded: nothing written since it loaded
+        pipe, touched, replayed = redis.pipeline(), set(from_snapshot), 0
+        for shard in sorted(from_snapshot):
+            first, n_bytes = shards.shard_bytes(shard)
+            pipe.set(shards.keys(shard)[0], data[first:first + n_bytes])
+        for ts, i, val in entries:
+            if i >= N_CHECKBOXES: continue
+            shard, local = shards.locate(i)
+            if (ts > taken_at if shard in from_snapshot or shard in missing else recover and saved_at < ts < started_at):
+                pipe.setbit(shards.keys(shard)[0], local, val); touched.add(shard); replayed += 1
+        for shard in touched: pipe.hset(shards.keys(shard)[2], "epoch", uuid4().hex[:8]) #chunk versions restarted from older values, retire old ETags
+        await pipe.execute()
+        if touched: print(f"[STARTUP] {board.id}: {len(from_snapshot)} bitmap shard(s) restored from snapshot ({len(data or b''):,} bytes), "
+                          f"{replayed:,} journaled toggles replayed into {len(touched)} shard(s)")
+
+    async def bitmap_snapshotter():
+        """Write each changed board to the volume every SNAPSHOT_INTERVAL, then drop the journal it covers"""
+        while True:
+            await asyncio.sleep(config.SNAPSHOT_INTERVAL)
+            for board in list(loaded_boards.values()):
+                if not board.changed_since_snapshot(): continue
+                try: await snapshot_bitmap(board)
+                except Exception as e: print(f"[SNAPSHOT ERROR] {board.id}: {e}")
+
+    async def snapshot_bitmap(board):
+        taken_at, seq = time.time(), board.toggle_log.seq #before the GET: journal lines after this are kept, replaying an already included one is harmless
+        shards = board.shards
+        data = await redis.mget([shards.keys(shard)[0] for shard in range(shards.n_shards)]) #shards concatenated: same layout as the mirror
+        await persistence.save_bitmap_snapshot(b"".join((d or b"")[:n].ljust(n, b"\x00") for d, (_, n) in
+                                                        zip(data, map(shards.shard_bytes, range(shards.n_shards)))), taken_at, board.snapshot_path)
+        await board.journal.compact(taken_at)
+        await volume.commit.aio()
+        board.snapshot_seq = seq
+        print(f"[SNAPSHOT] Board {board.id} snapshot written at {taken_at:.0f}")
+
+    async def journal_flusher():
+        while True:
+            await asyncio.sleep(config.JOURNAL_FLUSH_INTERVAL)
+            for board in list(loaded_boards.values()):
+                try: await board.journal.flush()
+                except Exception as e: print(f"[JOURNAL ERROR] {board.id}: {e}")
+
+    async def load_chunk_versions(board):
+        """Per-chunk version counters, one hash per shard; a shard's epoch changes if its hash is ever lost, so old ETags can't match new content"""
+        shards, pipe = board.shards, redis.pipeline()
+        for shard in range(shards.n_shards): pipe.hgetall(shards.keys(shard)[2])
+        hashes = await pipe.execute()
+        #an epoch for every hash that exists (always on the default board); a never toggled shard keeps "" and no key
+        if new := [shard for shard, versions in enumerate(hashes) if b"epoch" not in versions and (versions or board.id == boards.DEFAULT_BOARD)]:
+            pipe = redis.pipeline()
+            for shard in new: pipe.hsetnx(shards.keys(shard)[2], "epoch", uuid4().hex[:8]); pipe.hget(shards.keys(shard)[2], "epoch")
+            for shard, epoch in zip(new, (await pipe.execute())[1::2]): hashes[shard][b"epoch"] = epoch
+        board.chunk_versions["chunks"] = {}
+        for shard, versions in enumerate(hashes):
+            raw = {k.decode(): int(v) if k != b"epoch" else v.decode() for k, v in versions.items()}
+            board.chunk_versions["epochs"][shard] = raw.pop("epoch", "")
+            board.chunk_versions["chunks"].update({int(k): v for k, v in raw.items()})
+
+    async def load_bitmap_mirror(board):
+        """Pull every shard (125KB each) into its place in the board's in-process mirror with one MGET"""
+        start = time.time()
+        for shard, data in enumerate(await redis.mget([board.shards.keys(shard)[0] for shard in range(board.shards.n_shards)])):
+            board.mirror.load(data, *board.shards.shard_bytes(shard))
+        board.chunk_html_cache.clear()
+        print(f"[MIRROR] {board.id}: loaded {len(board.mirror.buf):,} bytes, {board.mirror.popcount():,} checked in {(time.time() - start) * 1000:.1f} ms")
+
+    async def resync_board(board):
+        """Re-read a loaded board's versions, bits and counters, for when toggles may have been missed (no subscription yet
+        or a dropped one) or Redis came back with older versions than this container has seen"""
+        before = bytes(board.mirror.buf)
+        await load_chunk_versions(board) #before the bits, as in load_board
+        await load_bitmap_mirror(board)
+        board.finish_reload(before)
+        await reconcile_checked_count(board)
+
+    async def get_checkbox_range_cached(board, start_idx: int, end_idx:int):
+        """ Load a specific range of chekcboxes, sliced from the board's local bitmap mirror"""
+        if not board.mirror.loaded: await load_bitmap_mirror(board)
+        return board.mirror.range(start_idx, end_idx)
+
+    async def get_status(board):
+        """ Get checked/unchecked counts from the incrementally maintained counter (O(1), no BITCOUNT)"""
+        checked = board.checked_counter["value"]
         return checked,N_CHECKBOXES - checked
 
+    async def reconcile_checked_count(board):
+        """Recompute each shard's counter from BITCOUNT (atomically in Redis) to repair any drift"""
+        pipe = redis.pipeline(transaction=False)
+        for shard in range(board.shards.n_shards): await recount_script(keys=board.shards.keys(shard)[:2], client=pipe)
+        for shard, count in enumerate(await pipe.execute()): board.set_shard_count(shard, int(count))
+        return board.checked_counter["value"]
+
+    async def count_reconciler():
+        while True:
+            await asyncio.sleep(config.COUNT_RECONCILE_INTERVAL)
+            for board in list(loaded_boards.values()):
+                try:
+                    drift = board.checked_counter["value"]
+                    print(f"[COUNT] Reconciled {board.id} checked count: {await reconcile_checked_count(board):,} (local was {drift:,})")
+                except Exception as e: print(f"[COUNT ERROR] {board.id}: {e}")
+
+    def touch_client(board, client):
+        """Heartbeat + move to the young end of the board's clients, which keeps the dict ordered by deadline for the reaper"""
+        client.heartbeat()
+        board.clients.move_to_end(client.id)
+        board.last_used = time.time()
+
+    async def client_reaper():
+        """Evict inactive clients from the old end of each board's clients; stops at the first live one"""
+        while True:
+            await asyncio.sleep(config.CLIENT_REAP_INTERVAL)
+            for board in list(loaded_boards.values()):
+                reaped, clients = 0, board.clients
+                while clients and not next(iter(clients.values())).is_active():
+                    clients.popitem(last=False); reaped += 1
+                if reaped: print(f"[CLIENTS] Reaped {reaped:,} inactive on {board.id}, live clients: {len(clients):,}")
+
+    background_writes = set() #fire-and-forget tasks
+    sse_streams = {"open": 0} #live /events streams in this container, bounded by SSE_MAX_STREAMS
+
+    async def flush_pending_writes(board):
+        """Apply a board's queued toggles to Redis in one pipeline, in order (SETBIT of the final value, so last writer wins)"""
+        if not (pending_writes := board.pending_writes): return
+        batch = pending_writes[:]; del pending_writes[:]
+        try:
+            pipe = redis.pipeline(transaction=False)
+            for i, val in batch:
+                shard, local = board.shards.locate(i)
+                await set_script(keys=board.shards.keys(shard), args=[local, int(val), i // LOAD_MORE_SIZE, toggles_channel, f"{CONTAINER_ID}:{board.id}", i], client=pipe)
+            results = await pipe.execute()
+        except Exception as e:
+            pending_writes[:0] = batch #keep order, retry on the next tick
+            print(f"[WRITE-BEHIND ERROR] {board.id}: {e}, {len(pending_writes):,} toggles pending"); return
+        for (i, val), (_, count, version) in zip(batch, results):
+            board.journal.append(i, val)
+            if not board.confirm_write(i, val, int(version)): schedule_refresh(board, i // LOAD_MORE_SIZE) #someone else wrote the chunk in between
+            board.set_shard_count(board.shards.locate(i)[0], int(count))
+        board.checked_counter["value"] = sum(board.checked_counter["shards"]) + sum(1 if v else -1 for _, v in pending_writes) #Redis counts + toggles still queued
+
+    async def refresh_chunk(board, chunk: int):
+        """Re-read one chunk's bits and version in a single MULTI after its versions arrived with a gap, retrying until it lands"""
+        shard, local = board.shards.locate(chunk * LOAD_MORE_SIZE)
+        bitmap_key, _, versions_key = board.shards.keys(shard)
+        while chunk in board.stale_chunks:
+            try:
+                pipe = redis.pipeline(transaction=True)
+                pipe.getrange(bitmap_key, local // 8, (local + LOAD_MORE_SIZE - 1) // 8)
+                pipe.hget(versions_key, chunk)
+                data, version = await pipe.execute()
+                if board.finish_refresh(chunk, data, int(version or 0)): return
+            except Exception as e: print(f"[REFRESH ERROR] {board.id} chunk {chunk}: {e}")
+            await asyncio.sleep(0.05)
+
+    def schedule_refresh(board, chunk: int):
+        task = asyncio.create_task(refresh_chunk(board, chunk)); background_writes.add(task); task.add_done_callback(background_writes.discard)
+
+    async def write_behind_flusher():
+        while True:
+            await asyncio.sleep(config.WRITE_BEHIND_FLUSH_MS / 1000)
+            for board in list(loaded_boards.values()): await flush_pending_writes(board)
+
+    async def toggle_subscriber():
+        """Apply toggles published by other containers to the local mirror and clients of boards loaded here"""
+        while True:
+            try:
+                async with redis.pubsub() as pubsub:
+                    await pubsub.subscribe(toggles_channel)
+                    print(f"[PUBSUB] Container {CONTAINER_ID} subscribed to {toggles_channel}")
+                    for board in list(loaded_boards.values()): #whatever was published before this subscription is missed
+                        try: await asyncio.shield(board.loading); await resync_board(board)
+                        except Exception as e: print(f"[PUBSUB ERROR] Resyncing {board.id}: {e}")
+                    async for message in pubsub.listen():
+                        if message["type"] != "message": continue
+                        origin, board_id, i, val, count, version = message["data"].decode().split(":")
+                        if origin == CONTAINER_ID or (board := loaded_boards.get(board_id)) is None: continue #not loaded: read fresh from Redis on first use
+                        board.set_shard_count(board.shards.locate(int(i))[0], int(count)) #count is the shard's, not the board's
+                        if not board.apply_toggle(int(i), val == "1", int(version)): schedule_refresh(board, int(i) // LOAD_MORE_SIZE) #missed or reordered
+            except asyncio.CancelledError: raise
+            except Exception as e:
+                print(f"[PUBSUB ERROR] {e}, resubscribing in 1s")
+                await asyncio.sleep(1)
+
+    def render_stats(board, checked, unchecked, **kwargs):
+        return fh.Div(  fh.Span(f"{checked:,}", cls="status-checked"), " checked • ",
+                        fh.Span(f"{unchecked:,}",cls="status-unchecked"), " unchecked",
+                        cls="stats", id="stats", hx_get=f"{board.url}/stats", hx_trigger="every 1s", hx_swap="outerHTML", **kwargs)
+
+    async def _refresh_stats_snapshot(board):
+        shards = board.shards
+        for shard, raw in enumerate(await redis.mget([shards.keys(shard)[1] for shard in range(shards.n_shards)])): #picks up other containers' toggles
+            if raw is not None: board.set_shard_count(shard, int(raw))
+        checked, unchecked = await get_status(board)
+        board.stats_snapshot.update(html=fh.to_xml(render_stats(board, checked, unchecked)), ts=time.time())
+
+    async def get_stats_snapshot(board):
+        """Pre-rendered /stats fragment, refreshed at most every STATS_SNAPSHOT_TTL by a single shared task"""
+        stats_snapshot = board.stats_snapshot
+        if stats_snapshot["html"] is not None and time.time() - stats_snapshot["ts"] < config.STATS_SNAPSHOT_TTL: return stats_snapshot["html"]
+        if (task := stats_snapshot["refresh"]) is None or task.done():
+            task = stats_snapshot["refresh"] = asyncio.create_task(_refresh_stats_snapshot(board))
+        try: await asyncio.shield(task) #a disconnecting request must not cancel the refresh the others are waiting on
+        except Exception as e:
+            print(f"[STATS ERROR] {e}")
+            if stats_snapshot["html"] is None: return fh.to_xml(render_stats(board, *await get_status(board)))
+        return stats_snapshot["html"]
+
     #web_app = fh.FastHTML( on_startup=[startup_migration], on_shutdown=[on_shutdown], hdrs=[fh.Style(open(css_path_remote, "r").read()),],)
     web_app = fh.FastHTML( hdrs=[fh.Style(open(css_path_remote, "r").read()),],)
-                                                                                            
+
+    def board_route(path: str, methods=("get",)):
+        """Serve a handler for the default board at `path` and for any other board under /b/{board_id}; handlers take `board_id`"""
+        def register(handler):
+            for p in (path, f"/b/{{board_id}}{path.rstrip('/')}"): web_app.route(p, methods=list(methods))(handler)
+            return handler
+        return register
+
     metrics_for_count = { "request_count" : 0,  "last_throughput_log" : time.time() }
     throughput_lock = asyncio.Lock()
 
@@ -111,25 +418,30 @@ def web():# Start redis server locally inside the container (persisted to volume
         response = await call_next(request)
         duration = (time.time() - start) * 1000 #ms
         print(f"[Latency] {request.url.path} -> {duration:.2f} ms")
-        
+        if (kind := "/chunk" if request.url.path.startswith("/chunk") else request.url.path) in ("/", "/chunk") and kind not in cold_start["first_served"]:
+            cold_start["first_served"].add(kind)
+            print(f"[COLD START] First {kind} served in {duration:.2f} ms, {(start - cold_start['ready']) * 1000:.0f} ms after ready")
+
         async with throughput_lock:
             metrics_for_count["request_count"] +=1
             now = time.time()
 
             if now - metrics_for_count["last_throughput_log"] >=5: #log throughput every 5 seconds
                 rsp = metrics_for_count["request_count"] / (now - metrics_for_count["last_throughput_log"])
-                print(f"[THROUGHPUT] {rsp:.2f} req/sec over last 5s")
+                print(f"[THROUGHPUT] {rsp:.2f} req/sec over last 5s | live clients: {sum(len(b.clients) for b in loaded_boards.values()):,} "
+                      f"on {len(loaded_boards)} board(s) | SSE streams: {sse_streams['open']:,}")
                 metrics_for_count["request_count"] = 0
                 metrics_for_count["last_throughput_log"] = now
-            
+
             if metrics_for_count["request_count"] % 100 == 0:
                 try: await logs_volume.commit.aio()
                 except: pass  # Don't fail requests if log commit fails
         return response
 
-    @web_app.get("/")
-    async def get(request):
+    @board_route("/")
+    async def get(request, view: str = "", board_id: str = boards.DEFAULT_BOARD):
         logger.info("📄 GET / - Homepage accessed")
+        if isinstance(board := await open_board(board_id), Response): return board
         client_ip = analytics.get_real_ip(request)
         user_agent = request.headers.get('user-agent', 'unknown')
         logger.info(f"Homepage view | IP: {client_ip} | UA: {user_agent[:50]}")
@@ -139,78 +451,200 @@ def web():# Start redis server locally inside the container (persisted to volume
         await analytics.track_page_view(client_ip, "/", referrer, redis)
         await analytics.track_referrer(client_ip, referrer, redis)
 
-        client = Client()  #register a new client
-        async with  clients_mutex: clients[client.id] = client
+        client = Client(board.toggle_log.seq)  #register a new client, it only needs toggles from here on
+        if view != "window": client.watch(0, LOAD_MORE_SIZE) #first chunk is rendered inline below
+        board.clients[client.id] = client #no await between lookup and insert, no lock needed
 
-        checked, unchecked = await get_status()
+        checked, unchecked = await get_status(board)
         await analytics.record_visitors(client_ip,user_agent, await geo.get_geo(client_ip, redis), redis)
-        first_chunk_html= await _render_chunk(client.id, offset=0)
+        windowed = view == "window" #virtualized viewport: only visible rows are rendered, by realtime.GRID_JS
+        first_chunk_html= "" if windowed else await _render_chunk(board, offset=0)
+        title = "One Million Checkboxes" if board.id == boards.DEFAULT_BOARD else f"One Million Checkboxes · {board.id}"
         return( 
-            fh.Titled(f"One Million Checkboxes"),
+            fh.Titled(title),
             fh.Main(
                 fh.Script(analytics.TRACKER_JS),
                 fh.Div(NotStr("""<script data-name="BMC-Widget" data-cfasync="false" 
                     src="https://cdnjs.buymeacoffee.com/1.0.0/widget.prod.min.js" 
                     data-id="gptagent.unlock"  data-description="Support me!" data-message="" 
                     data-color="#FFDD00"  data-position="top" data-x_margin="0" data-y_margin="0"></script> """),
-                    fh.H1(f" One Million Checkboxes"), style="display: flex; flex-direction: column; align-items: center; gap: 10px;" ),
-                fh.Div( fh.Span(f"{checked:,}", cls="status-checked"), " checked • ",
-                        fh.Span(f"{unchecked:,}",cls="status-unchecked"), " unchecked", 
-                        cls="stats", id="stats", hx_get="/stats", hx_trigger="every 1s",hx_swap="outerHTML" ),
-                fh.Div( fh.NotStr(first_chunk_html), cls="grid-container", id="grid-container",
-                        hx_get=f"/diffs/{client.id}", hx_trigger="every 500ms",hx_swap="none"),
+                    fh.H1(f" {title}"), style="display: flex; flex-direction: column; align-items: center; gap: 10px;" ),
+                render_stats(board, checked, unchecked),
+                fh.Div( fh.Input(type="number", id="jump-to", min=0, max=N_CHECKBOXES - 1, placeholder="Jump to checkbox #"),
+                        fh.Button("Go", id="jump-go"), fh.A("Classic view", href=f"{board.url}/"), cls="jump-control") if windowed else
+                fh.Div( fh.A("Windowed view (jump to any checkbox)", href=f"{board.url}/?view=window"), cls="jump-control"),
+                fh.Div( fh.Div(fh.Div(cls="grid-rows"), cls="grid-spacer") if windowed else fh.NotStr(first_chunk_html),
+                        cls="grid-container grid-window" if windowed else "grid-container", id="grid-container",
+                        hx_headers=json.dumps({"X-Client-Id": client.id}), #inherited by every input, keeps chunk markup client independent
+                        data_client_id=client.id, data_total=N_CHECKBOXES, data_chunk=LOAD_MORE_SIZE, data_view=view, data_prefix=board.url,
+                        hx_get=f"{board.url}/diffs/{client.id}", hx_trigger="every 500ms",hx_swap="none"),
+                fh.Script(realtime.GRID_JS), #after the grid so it can find #grid-container
+                fh.Form(fh.Input(name="board_id", placeholder="new-board-name", pattern=boards.BOARD_ID_RE.pattern, required=True),
+                        fh.Button("Create a board"), method="post", action="/boards", cls="jump-control"),
                 fh.Div("Made with FastHTML + Redis deployed with Modal", cls="footer"), cls="container"))
 
-    @web_app.get("/stats")
-    async def stats():
-        checked, unchecked = await get_status()
-        print(f"[STATS] Checked: {checked:,}, Unchecked: {unchecked:,}")
-        return fh.Div(  fh.Span(f"{checked:,}", cls="status-checked"), " checked • ",
-                        fh.Span(f"{unchecked:,}",cls="status-unchecked"), " unchecked", cls="stats", id="stats", hx_get="every 2s", hx_swap="outerHTML")
-    
-    @web_app.get("/chunk/{client_id}/{offset}")
-    async def chunk(client_id:str, offset:int):
-        return fh.NotStr(await _render_chunk(client_id,offset) )
-         
-    async def _render_chunk(client_id:str, offset:int)->str:
+    @board_route("/stats")
+    async def stats(board_id: str = boards.DEFAULT_BOARD):
+        if isinstance(board := await open_board(board_id), Response): return board
+        return fh.NotStr(await get_stats_snapshot(board))
+
+    def chunk_etag(board, offset:int):
+        """ETag for an aligned chunk, changes whenever a toggle lands in it (None for unaligned offsets)"""
+        if offset % LOAD_MORE_SIZE or not 0 <= offset < N_CHECKBOXES: return None
+        epoch = board.chunk_versions["epochs"][board.shards.locate(offset)[0]]
+        return f'"{epoch}-{LOAD_MORE_SIZE}-{offset}-{board.chunk_versions["chunks"].get(offset // LOAD_MORE_SIZE, 0)}"'
+
+    async def _chunk_response(request, board_id:str, offset:int, render, media_type:str, client_id:str = None):
+        """Subscribe the requesting client to this range, then answer If-None-Match with 304 when the chunk's version is unchanged, else render with its ETag"""
+        if not 0 <= offset < N_CHECKBOXES: return Response("offset must be a checkbox index", status_code=400)
+        if isinstance(board := await open_board(board_id), Response): return board
+        if client := board.clients.get(client_id or request.headers.get("X-Client-Id", "")): client.watch(offset, offset + LOAD_MORE_SIZE)
+        etag = chunk_etag(board, offset)
+        if etag and etag in request.headers.get("if-none-match", ""): return Response(status_code=304, headers={"ETag": etag})
+        return Response(await render(board), media_type=media_type, headers={"ETag": etag, "Cache-Control": "no-cache"} if etag else {})
+
+    @board_route("/chunk/{offset}")
+    async def chunk(request, offset:int, board_id: str = boards.DEFAULT_BOARD):
+        return await _chunk_response(request, board_id, offset, lambda board: _render_chunk(board, offset), "text/html")
+
+    @web_app.get("/chunk/{client_id}/{offset}") #pre-hx-headers URL, still linked from pages that are already open
+    async def chunk_for_client(request, client_id:str, offset:int):
+        return await _chunk_response(request, boards.DEFAULT_BOARD, offset, lambda board: _render_chunk(board, offset), "text/html", client_id)
+
+    @board_route("/chunk-bits/{offset}") #packed bitmap slice for the client-side renderer (realtime.GRID_JS), ~250 bytes per chunk
+    async def chunk_bits(request, offset:int, board_id: str = boards.DEFAULT_BOARD):
+        if offset % 8 or not 0 <= offset < N_CHECKBOXES: return Response("offset must be a byte-aligned checkbox index", status_code=400)
+        async def render(board):
+            if not board.mirror.loaded: await load_bitmap_mirror(board)
+            return board.mirror.span(offset, min(offset + LOAD_MORE_SIZE, N_CHECKBOXES))
+        return await _chunk_response(request, board_id, offset, render, "application/octet-stream")
+
+    async def _render_chunk(board, offset:int)->str:
+        """Chunk markup is identical for every client (the client id travels in the inherited hx-headers), so aligned chunks are cached"""
+        chunk_html_cache = board.chunk_html_cache
+        if (html := chunk_html_cache.get(offset)) is not None:
+            chunk_html_cache.move_to_end(offset)
+            return html
         start_idx, end_idx = offset, min(offset + LOAD_MORE_SIZE, N_CHECKBOXES)
-        print(f"[CHUNK] Loading {start_idx:,}-{end_idx:,} for {client_id[:8]}")
-        checked_values = await get_checkbox_range_cached(start_idx, end_idx)
+        print(f"[CHUNK] Rendering {board.id} {start_idx:,}-{end_idx:,}")
+        checked_values = await get_checkbox_range_cached(board, start_idx, end_idx)
         parts =[f'<input type="checkbox" id="cb-{i}" class="cb" {"checked" if is_checked else ''} '
-                f'hx-post="/toggle/{i}/{client_id}" hx-swap="none">' 
+                f'hx-post="{board.url}/toggle/{i}" hx-swap="none">'
                 for i, is_checked in enumerate(checked_values, start=start_idx)]
         if end_idx < N_CHECKBOXES:
-            parts.append( f'<span class="lazy-trigger" hx-get="/chunk/{client_id}/{end_idx}" '
+            parts.append( f'<span class="lazy-trigger" hx-get="{board.url}/chunk/{end_idx}" '
                           f'hx-trigger="intersect once" hx-target="#grid-container" hx-swap="beforeend"></span>' )
-        return "".join(parts)
-    
-    @web_app.post("/toggle/{i}/{client_id}")
-    async def toggle(request, i: int, client_id: str):
+        html = "".join(parts)
+        if offset % LOAD_MORE_SIZE == 0: #only aligned chunks, so a toggle invalidates exactly one entry
+            chunk_html_cache[offset] = html
+            if len(chunk_html_cache) > config.CHUNK_CACHE_SIZE: chunk_html_cache.popitem(last=False)
+        return html
+
+    @board_route("/toggle/{i}", methods=("post",))
+    async def toggle(request, i: int, board_id: str = boards.DEFAULT_BOARD):
+        return await _toggle(request, board_id, i, request.headers.get("X-Client-Id", ""))
+
+    @web_app.post("/toggle/{i}/{client_id}") #pre-hx-headers URL, still used by pages that are already open
+    async def toggle_for_client(request, i: int, client_id: str):
+        return await _toggle(request, boards.DEFAULT_BOARD, i, client_id)
+
+    async def toggle_allowed(client_id: str, client_ip: str) -> bool:
+        """Token buckets per tab and per IP: in-process first (no I/O), then the shared Redis buckets if enabled.
+        The tab id is client supplied, so the IP bucket (keyed on ratelimit.peer_ip) is what actually bounds a script"""
+        if not (client_limiter.allow(client_id) and ip_limiter.allow(client_ip)): return False
+        if not config.RATE_LIMIT_SHARED: return True
+        try:
+            return bool(await bucket_script(keys=[f"ratelimit:toggle:client:{client_id}"], args=[config.TOGGLE_CLIENT_BURST, config.TOGGLE_CLIENT_RATE])
+                        and await bucket_script(keys=[f"ratelimit:toggle:ip:{client_ip}"], args=[config.TOGGLE_IP_BURST, config.TOGGLE_IP_RATE]))
+        except Exception as e: print(f"[RATE LIMIT ERROR] {e}"); return True #fail open, the local buckets still apply
+
+    async def _toggle(request, board_id: str, i: int, client_id: str):
         client_ip = analytics.get_real_ip(request)
-        await analytics.log_event(client_ip, "checkbox_toggle", {"checkbox_id": i, "client_id": client_id, "timestamp": time.time()}, redis)
-        async with clients_mutex:
-            current = checkbox_cache.get(i, bool(await redis.getbit(checkboxes_bitmap_key, i)))
-            new_val = not current; checkbox_cache[i] = new_val
+        if not 0 <= i < N_CHECKBOXES: return Response("checkbox index out of range", status_code=400)
+        if isinstance(board := await open_board(board_id), Response): return board
+        if not await toggle_allowed(client_id, peer := ratelimit.peer_ip(request)): #not client_ip: its headers are client controlled
+            print(f"[RATE LIMIT] Toggle rejected | client {client_id[:8]} | IP {peer}")
+            return Response("Too many toggles, slow down", status_code=429, headers={"Retry-After": "1"})
+        event = analytics.log_event(client_ip, "checkbox_toggle", {"checkbox_id": i, "board": board.id, "client_id": client_id, "timestamp": time.time()}, redis)
+        if config.WRITE_BEHIND: #flip locally now, Redis catches up on the next flush; analytics doesn't hold up the response either
+            task = asyncio.create_task(event); background_writes.add(task); task.add_done_callback(background_writes.discard)
+            if not board.mirror.loaded: await load_bitmap_mirror(board)
+            new_val = not board.mirror.get(i)
+            board.checked_counter["value"] += 1 if new_val else -1
+            board.pending_writes.append((i, new_val))
+            board.apply_toggle(i, new_val, None, skip_client_id=client_id)
+            return render_stats(board, *await get_status(board), hx_swap_oob="true")
+        await event
+        try: #single atomic flip + counter update in Redis (BITFIELD u1 + 1 with wrap, INCRBY +-1), no lock and no read-modify-write race
+            shard, local = board.shards.locate(i) #one shard key per BITMAP_SHARD_BITS boxes, so no single hot key on big boards
+            new_val, count, version = await toggle_script(keys=board.shards.keys(shard), args=[local, i // LOAD_MORE_SIZE, toggles_channel, f"{CONTAINER_ID}:{board.id}", i])
+            new_val = bool(new_val); board.set_shard_count(shard, int(count))
+            if not board.apply_toggle(i, new_val, version, skip_client_id=client_id): schedule_refresh(board, i // LOAD_MORE_SIZE)
+            board.journal.append(i, new_val)
+            print(f"[TOGGLE] {board.id} {i}: {not new_val} -> {new_val}")
+        except Exception as e: print(f"[TOGGLE ERROR] {e}")
+        c, u = await get_status(board)
+        return render_stats(board, c, u, hx_swap_oob="true")
+
+    @board_route("/events/{client_id}") #SSE push of diffs + counts, /diffs and /stats polling remain as fallback
+    async def events(client_id:str, board_id: str = boards.DEFAULT_BOARD):
+        if (board := loaded_boards.get(board_id)) is None or client_id not in board.clients: return Response(status_code=204) #204 tells EventSource not to reconnect
+        if sse_streams["open"] >= config.SSE_MAX_STREAMS: return Response(status_code=204) #full: this tab stays on /diffs + /stats polling
+        async def stream():
+            last_status = None
+            sse_streams["open"] += 1
             try:
-                await redis.setbit(checkboxes_bitmap_key, i, 1 if new_val else 0)
-                print(f"[TOGGLE] {i}: {current} -> {new_val}")
-            except Exception as e: print(f"[TOGGLE ERROR] {e}")
-            expired = [cid for cid, cl in clients.items() if cid != client_id and (not cl.is_active() or (lambda: cl.add_diff(i) or False)())]
-            for cid in expired: del clients[cid]
-        c, u = await get_status()
-        return fh.Div(fh.Span(f"{c:,}", cls="status-checked"), " checked • ", fh.Span(f"{u:,}", cls="status-unchecked"),
-                      " unchecked", cls="stats", id="stats", hx_get="/stats", hx_trigger="every 1s", hx_swap="outerHTML", hx_swap_oob="true")
-
-    @web_app.get("/diffs/{client_id}") #clients polling for outstanding diffs
-    async def diffs(request, client_id:str):
-        async with clients_mutex:
-            client = clients.get(client_id, None)
-            if client is None or len(client.diffs) == 0: return ""
-            client.heartbeat()
-            diffs_list = client.pull_diffs()
-        return [fh.Input(type="checkbox", id=f"cb-{i}", checked = bool(await redis.getbit(checkboxes_bitmap_key, i)), 
-                         hx_post=f"/toggle/{i}/{client_id}", hx_swap="none", hx_swap_oob="true", cls= "cb" ) for i in diffs_list ]
-      
+                yield realtime.sse_retry(config.SSE_RETRY_MS)
+                while (client := board.clients.get(client_id)) is not None: #until the tab is reaped or disconnects
+                    touch_client(board, client)
+                    diffs_list = client.pull_diffs(board.toggle_log)
+                    if resync := client.take_resync(): yield realtime.sse_event("resync", {"resync": resync})
+                    if diffs_list: yield realtime.sse_event("diffs", realtime.diff_pairs(board.mirror, diffs_list))
+                    if (status := await get_status(board)) != last_status:
+                        last_status = status
+                        yield realtime.sse_event("stats", {"checked": status[0], "unchecked": status[1]})
+                    try: await asyncio.wait_for(board.toggle_log.wait(client.last_seq), timeout=config.SSE_KEEPALIVE)
+                    except asyncio.TimeoutError: yield realtime.SSE_KEEPALIVE_FRAME
+                    else: await asyncio.sleep(config.SSE_COALESCE) #batch the toggles that follow: each stream wakes at most 1/SSE_COALESCE times a second
+            finally: sse_streams["open"] -= 1
+        return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    @board_route("/viewport/{client_id}", methods=("post",)) #windowed view: replace the client's subscribed ranges with the chunk offsets it holds
+    async def viewport(request, client_id:str, board_id: str = boards.DEFAULT_BOARD):
+        if (board := loaded_boards.get(board_id)) is None or (client := board.clients.get(client_id)) is None: return Response(status_code=404)
+        try:
+            offsets = (await request.json()).get("offsets", [])[:config.MAX_VIEWPORT_CHUNKS]
+            if not all(type(offset) is int and 0 <= offset < N_CHECKBOXES for offset in offsets): raise ValueError
+        except (ValueError, AttributeError, TypeError): return Response('expected {"offsets": [checkbox indices]}', status_code=400)
+        client.chunk_mask = 0
+        for offset in offsets: client.watch(offset, offset + LOAD_MORE_SIZE)
+        return {"status": "ok", "chunks": client.chunk_mask.bit_count()}
+
+    @board_route("/diffs/{client_id}") #clients polling for outstanding diffs
+    async def diffs(request, client_id:str, board_id: str = boards.DEFAULT_BOARD):
+        if (board := loaded_boards.get(board_id)) is None or (client := board.clients.get(client_id, None)) is None: return ""
+        touch_client(board, client)
+        diffs_list = client.pull_diffs(board.toggle_log)
+        if resync := client.take_resync(): #JSON appliers reload just these chunks, plain htmx pages get a full refresh
+            return JSONResponse({"resync": resync}) if "application/json" in request.headers.get("accept", "") else Response(headers={"HX-Refresh": "true"})
+        if not diffs_list: return ""
+        pairs = realtime.diff_pairs(board.mirror, diffs_list) #one pass over the local mirror, no Redis calls
+        if "application/json" in request.headers.get("accept", ""): return JSONResponse(pairs) #applied by realtime.GRID_JS
+        return [fh.Input(type="checkbox", id=f"cb-{i}", checked = bool(v), 
+                         hx_post=f"{board.url}/toggle/{i}", hx_swap="none", hx_swap_oob="true", cls= "cb" ) for i, v in pairs ]
+
+    @web_app.post("/boards") #boards exist only once created here, so visiting /b/<anything> never writes to Redis or the volume
+    async def create_board(request, board_id: str = ""):
+        board_id = board_id.strip().lower()
+        if not boards.valid_board_id(board_id) or board_id == boards.DEFAULT_BOARD:
+            return Response("board names are 1-32 lowercase letters, digits, - and _", status_code=400)
+        if not await redis.sismember(boards.REGISTRY_KEY, board_id):
+            if not board_create_limiter.allow(ratelimit.peer_ip(request)): return Response("Too many new boards, try again later", status_code=429, headers={"Retry-After": "600"})
+            if await redis.scard(boards.REGISTRY_KEY) >= config.MAX_BOARDS: return Response("No more boards can be created", status_code=403)
+            await redis.sadd(boards.REGISTRY_KEY, board_id)
+            print(f"[BOARD] Created {board_id}")
+        return RedirectResponse(f"/b/{board_id}", status_code=303)
+
     @web_app.get("/referrer-stats")
     async def referrer_stats_page(request):
         return await analytics.render_referrer_stats_page(redis)
@@ -264,19 +698,35 @@ def web():# Start redis server locally inside the container (persisted to volume
 
     @asynccontextmanager
     async def lifespan(app):
-        #startup
+        #startup: everything below runs before Starlette accepts the first request
         await startup_migration()
+        warm = time.time()
+        await _render_chunk(loaded_boards[boards.DEFAULT_BOARD], offset=0) #first chunk pre-rendered into the default board's chunk_html_cache
+        cold_start["ready"] = time.time()
+        print(f"[STARTUP] Ready in {(cold_start['ready'] - cold_start['boot']) * 1000:.0f} ms since container start "
+              f"(first chunk warm render {(cold_start['ready'] - warm) * 1000:.1f} ms)")
+        background_tasks = [asyncio.create_task(toggle_subscriber()), asyncio.create_task(count_reconciler()), asyncio.create_task(client_reaper())]
+        background_tasks += [asyncio.create_task(bitmap_snapshotter()), asyncio.create_task(journal_flusher()), asyncio.create_task(board_evictor())]
+        if config.WRITE_BEHIND: background_tasks.append(asyncio.create_task(write_behind_flusher()))
         yield
         #shutdown
-        print("shuttting down...saving Redis data")
-        try:
-            await redis.save()
-            print("Redis data saved successfully")
-        except Exception as e:
-            print(f"Error saving Redis data: {e}")
+        for task in background_tasks: task.cancel()
+        for board in list(loaded_boards.values()):
+            await flush_pending_writes(board) #nothing queued is lost on a clean shutdown
+            if not board.changed_since_snapshot(): continue
+            try: await snapshot_bitmap(board)
+            except Exception as e: print(f"[SNAPSHOT ERROR] {board.id}: {e}")
+        if redis_process: #a shared Redis owns its own persistence, only the embedded one is saved here
+            print("shuttting down...saving Redis data")
+            try:
+                await redis.save()
+                print("Redis data saved successfully")
+            except Exception as e:
+                print(f"Error saving Redis data: {e}")
         await redis.close()
-        redis_process.terminate()
-        redis_process.wait()
+        if redis_process:
+            redis_process.terminate()
+            redis_process.wait()
         await volume.commit.aio()
         await logs_volume.commit.aio()
         print("Logs and Volume commited - data persisted")
@@ -308,13 +758,15 @@ def web():# Start redis server locally inside the container (persisted to volume
                 Route("/track-blog-view", track_blog_view, methods=["POST"]),
                 Mount("/", app=web_app),] )
     
-class Client:
-    def __init__(self):
+class Client: #one per open tab, kept small: thousands of idle tabs live in one container
+    __slots__ = ("id", "last_seq", "chunk_mask", "inactive_deadline", "resync_mask")
+
+    def __init__(self, last_seq=0):
         self.id = str(uuid4())
-        self.diffs = []
+        self.last_seq = last_seq #position in the shared toggle_log this client has been sent up to
+        self.chunk_mask = 0 #bitset of chunk indices this client has rendered, only diffs inside them are sent
         self.inactive_deadline = time.time() + 30
-        self.geo = None
-        self.geo_ts = 0.0
+        self.resync_mask = 0 #bitset of chunks the client must reload instead of receiving their (too many) diffs
     
     def is_active(self): 
         return time.time() < self.inactive_deadline
@@ -322,16 +774,25 @@ class Client:
     def heartbeat(self): 
         self.inactive_deadline = time.time() + 30
 
-    def add_diff(self, i):
-        if i not in self.diffs: self.diffs.append(i)
-
-    def pull_diffs(self):
-        diffs, self.diffs = self.diffs, []
-        return diffs
-
-    def set_geo(self, geo_obj, now=None): 
-        self.geo = geo_obj 
-        self.geo_ts = now or time.time()
-
-    def has_recent_geo(self, now=None): 
-        return (self.geo is not None) and ((now or time.time()) - self.geo_ts) <= config.CLIENT_GEO_TTL
\ No newline at end of file
+    def watch(self, start_idx, end_idx):
+        start_idx = max(start_idx, 0) #callers validate, but a negative chunk would make `1 << chunk` raise
+        for chunk in range(start_idx // LOAD_MORE_SIZE, (min(end_idx, N_CHECKBOXES) - 1) // LOAD_MORE_SIZE + 1): self.chunk_mask |= 1 << chunk
+
+    def watches(self, i):
+        return self.chunk_mask >> (i // LOAD_MORE_SIZE) & 1
+
+    def pull_diffs(self, log):
+        """Pending indices inside the watched chunks; past MAX_CLIENT_DIFFS they collapse into a resync of the affected chunks
+        (all watched chunks if the client fell off the ring and we no longer know which)"""
+        diffs, self.last_seq = log.since(self.last_seq, skip_origin=self.id)
+        if diffs is None: self.resync_mask |= self.chunk_mask
+        elif len(diffs := [i for i in diffs if self.watches(i)]) > config.MAX_CLIENT_DIFFS:
+            for i in diffs: self.resync_mask |= 1 << (i // LOAD_MORE_SIZE)
+        else: return diffs
+        print(f"[DIFFS] Client {self.id[:8]} fell too far behind, asking for a resync of {self.resync_mask.bit_count()} chunks")
+        return []
+
+    def take_resync(self):
+        """Offsets of the chunks to reload (empty if none), clearing the request"""
+        mask, self.resync_mask = self.resync_mask, 0
+        return [chunk * LOAD_MORE_SIZE for chunk in range(mask.bit_length()) if mask >> chunk & 1]
\ No newline at end of file
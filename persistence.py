@@ -1,7 +1,11 @@
 import aiosqlite
-import json, time
+import json, time, os, struct, asyncio
+from pathlib import Path
 
 SQLITE_DB_PATH = "/data/visitors.db"
+BITMAP_SNAPSHOT_PATH = "/data/bitmap_snapshot.bin"
+JOURNAL_DIR = "/data/toggle_journal"
+BOARDS_DIR = "/data/boards" #snapshot + journal of every board other than the default one, one directory per board id
 
 async def init_sqlite_db():
     async with aiosqlite.connect(SQLITE_DB_PATH) as db:
@@ -74,6 +78,69 @@ async def get_visitor_count_sqlite():
     except Exception  as e: print(f"[SQLite ERROR] Failed to get count: {e}"); return 0
 
 
+def _write_atomic(path: str, data: bytes):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data); f.flush(); os.fsync(f.fileno())
+    os.replace(tmp, path) #readers see the old snapshot or the new one, never a partial file
+
+async def save_bitmap_snapshot(data: bytes, taken_at: float, path: str = BITMAP_SNAPSHOT_PATH):
+    """Snapshot file = 8-byte big-endian timestamp + the raw Redis bitmap"""
+    await asyncio.to_thread(_write_atomic, path, struct.pack(">d", taken_at) + (data or b""))
+
+def load_bitmap_snapshot(path: str = BITMAP_SNAPSHOT_PATH):
+    """(bitmap bytes, taken_at) or (None, 0.0) if there is no snapshot yet"""
+    try: raw = Path(path).read_bytes()
+    except FileNotFoundError: return None, 0.0
+    return raw[8:], struct.unpack(">d", raw[:8])[0]
+
+def _line_ts(line: str) -> float:
+    try: return float(line.split(" ", 1)[0])
+    except ValueError: return 0.0
+
+def read_journal_entries(after: float, journal_dir: str = JOURNAL_DIR):
+    """All journaled toggles newer than `after`, from every container's journal, in time order: [(ts, index, value)]"""
+    entries = []
+    for path in Path(journal_dir).glob("*.log") if Path(journal_dir).exists() else []:
+        for line in path.read_text().splitlines():
+            try: ts, i, val = line.split(); ts = float(ts)
+            except ValueError: continue #torn last line from a crash
+            if ts > after: entries.append((ts, int(i), int(val)))
+    return sorted(entries)
+
+class ToggleJournal:
+    """Append-only log of applied toggles (absolute values, so replay is idempotent), one file per container.
+    Lines are buffered by append() and written + fsynced by flush(), which the app calls every JOURNAL_FLUSH_INTERVAL."""
+    def __init__(self, container_id: str, journal_dir: str = JOURNAL_DIR):
+        self.path, self.buffer = Path(journal_dir) / f"{container_id}.log", []
+
+    def append(self, i: int, val: bool):
+        self.buffer.append(f"{time.time():.6f} {i} {int(val)}\n")
+
+    def _write(self, lines):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a") as f:
+            f.writelines(lines); f.flush(); os.fsync(f.fileno())
+
+    async def flush(self):
+        if not self.buffer: return
+        lines, self.buffer = self.buffer, []
+        await asyncio.to_thread(self._write, lines)
+
+    def _compact(self, before: float):
+        if self.path.exists(): #keep only what the snapshot may not contain
+            keep = [line for line in self.path.read_text().splitlines() if _line_ts(line) > before]
+            _write_atomic(str(self.path), "".join(line + "\n" for line in keep).encode())
+        for path in self.path.parent.glob("*.log"): #journals of containers that are gone
+            if path != self.path and path.stat().st_mtime < before: path.unlink(missing_ok=True)
+
+    async def compact(self, before: float):
+        """Drop entries covered by a snapshot taken at `before`"""
+        await self.flush()
+        await asyncio.to_thread(self._compact, before)
+
+
 
 # def resolve_referrer(request) -> str:
 #     utm_source = request.query_params.get("utm_source")
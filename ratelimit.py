@@ -0,0 +1,39 @@
+"""Token-bucket rate limiting for the toggle endpoint"""
+import time
+from collections import OrderedDict
+
+def peer_ip(request) -> str:
+    """Address to rate limit on: the hop appended by our own front proxy (rightmost X-Forwarded-For entry), else the socket peer.
+    Unlike analytics.get_real_ip this never trusts CF-Connecting-IP or the leftmost X-Forwarded-For, which any client can set."""
+    hops = [hop.strip() for hop in request.headers.get("X-Forwarded-For", "").split(",") if hop.strip()]
+    return hops[-1] if hops else (request.client.host if request.client else "unknown")
+
+class TokenBucketLimiter:
+    """In-process token buckets keyed by string (client id, IP), `burst` tokens refilled at `rate` per second.
+    Only the `max_keys` most recently seen keys are tracked, an evicted key simply starts again with a full bucket."""
+    def __init__(self, burst: float, rate: float, max_keys: int = 100_000):
+        self.burst, self.rate, self.max_keys = burst, rate, max_keys
+        self.buckets = OrderedDict() #key -> (tokens, last refill), least recently used first
+
+    def allow(self, key: str, now: float = None) -> bool:
+        now = time.monotonic() if now is None else now
+        tokens, ts = self.buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - ts) * self.rate)
+        allowed = tokens >= 1
+        self.buckets[key] = (tokens - 1 if allowed else tokens, now)
+        if len(self.buckets) > self.max_keys: self.buckets.popitem(last=False)
+        return allowed
+
+# Shared bucket across containers | KEYS: bucket hash | ARGV: burst, rate per second -> 1 allowed, 0 limited (Redis clock, so containers agree)
+SHARED_BUCKET_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local burst, rate = tonumber(ARGV[1]), tonumber(ARGV[2])
+local b = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = math.min(burst, (tonumber(b[1]) or burst) + math.max(0, now - (tonumber(b[2]) or now)) * rate)
+local allowed = 0
+if tokens >= 1 then tokens = tokens - 1; allowed = 1 end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return allowed
+"""
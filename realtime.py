@@ -0,0 +1,166 @@
+"""Server push helpers for the checkbox grid (Server-Sent Events + the browser side applier)"""
+import json, asyncio
+
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Events frame, `data` is sent as JSON"""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+SSE_KEEPALIVE_FRAME = ": keepalive\n\n"
+
+def sse_retry(ms: int) -> str:
+    """Frame telling EventSource how long to wait before reconnecting once the stream ends"""
+    return f"retry: {ms}\n\n"
+
+def diff_pairs(mirror, indices) -> list:
+    """Compact diff payload: [index, 0|1] pairs read from the local bitmap mirror"""
+    return [[i, int(mirror.get(i))] for i in indices]
+
+class ToggleLog:
+    """Fixed-size ring of recent toggles with monotonically increasing sequence numbers.
+    Appending is O(1) however many viewers there are; each client only remembers the last seq it was sent."""
+    def __init__(self, size: int):
+        self.size, self.seq = size, 0
+        self.entries = [None] * size #slot seq % size -> (index, origin client id)
+        self._changed = asyncio.Event()
+
+    def append(self, i: int, origin: str = None):
+        self.seq += 1
+        self.entries[self.seq % self.size] = (i, origin)
+        self._changed.set(); self._changed = asyncio.Event() #wake everyone waiting on the old event
+
+    def since(self, seq: int, skip_origin: str = None):
+        """(indices toggled after `seq`, deduplicated, excluding `skip_origin`'s own; None if they already left the ring), new seq"""
+        if seq < self.seq - self.size: return None, self.seq
+        entries = (self.entries[s % self.size] for s in range(seq + 1, self.seq + 1))
+        return list(dict.fromkeys(i for i, origin in entries if origin is None or origin != skip_origin)), self.seq
+
+    async def wait(self, seq: int):
+        """Return once something newer than `seq` has been appended"""
+        if self.seq <= seq: await self._changed.wait()
+
+GRID_JS = r"""
+    const grid = { live: false, htmlChunks: new Set(),
+        init() {
+            this.el = document.getElementById('grid-container');
+            this.clientId = this.el.dataset.clientId; this.prefix = this.el.dataset.prefix || ''; // '/b/<board id>' off the default board
+            const rel = (path) => path.startsWith(this.prefix + '/') ? path.slice(this.prefix.length) : path;
+            this.total = parseInt(this.el.dataset.total); this.chunk = parseInt(this.el.dataset.chunk);
+            if (this.el.dataset.view === 'window') this.initWindow();
+            // the hx-trigger polling of /diffs and /stats stays in the markup as a fallback, it is skipped while the stream is open
+            document.addEventListener('htmx:beforeRequest', (e) => {
+                const path = rel(e.detail.pathInfo?.requestPath || '');
+                if (this.live && (path.startsWith('/diffs/') || path.startsWith('/stats'))) e.preventDefault();
+                // lazy-trigger: fetch the packed bits (/chunk-bits) instead of 2,000 server-rendered inputs
+                const m = path.match(/^\/chunk\/(?:[^/]+\/)?(\d+)$/);
+                if (m && window.fetch && !this.htmlChunks.has(this.prefix + path)) { e.preventDefault(); this.loadBits(parseInt(m[1]), e.detail.elt, this.prefix + path); } });
+            // /diffs polling: ask for the compact [index, value] payload and apply it here (htmx itself swaps nothing)
+            document.addEventListener('htmx:configRequest', (e) => {
+                if (rel(e.detail.path).startsWith('/diffs/')) e.detail.headers['Accept'] = 'application/json'; });
+            document.addEventListener('htmx:afterRequest', (e) => {
+                if (e.detail.successful && rel(e.detail.pathInfo?.requestPath || '').startsWith('/diffs/') && e.detail.xhr.responseText)
+                    this.applyUpdate(JSON.parse(e.detail.xhr.responseText)); });
+            // rate limited (429): the toggle never happened, put the box back
+            document.addEventListener('htmx:afterRequest', (e) => {
+                const m = rel(e.detail.pathInfo?.requestPath || '').match(/^\/toggle\/(\d+)/);
+                if (!m || e.detail.xhr.status !== 429) return;
+                const cb = document.getElementById(`cb-${m[1]}`); if (!cb) return;
+                cb.checked = !cb.checked; this.setBit(parseInt(m[1]), cb.checked); });
+            // inputs rendered here carry data-i instead of hx-post
+            this.el.addEventListener('change', (e) => { const i = e.target.dataset?.i;
+                if (i !== undefined) this.setBit(parseInt(i), e.target.checked);
+                if (i !== undefined) htmx.ajax('POST', `${this.prefix}/toggle/${i}`, {target: '#stats', swap: 'none', headers: {'X-Client-Id': this.clientId}}); });
+            if (!window.EventSource) return;
+            const source = new EventSource(`${this.prefix}/events/${this.clientId}`);
+            source.onopen = () => { this.live = true; };
+            source.onerror = () => { this.live = false; };
+            source.addEventListener('diffs', (e) => this.applyDiffs(JSON.parse(e.data)));
+            source.addEventListener('stats', (e) => this.applyStats(JSON.parse(e.data)));
+            source.addEventListener('resync', (e) => this.resync(JSON.parse(e.data))); },
+
+        async loadBits(offset, trigger, htmlPath) {
+            let bytes;
+            try { const res = await fetch(`${this.prefix}/chunk-bits/${offset}`, {headers: {'X-Client-Id': this.clientId}}); if (!res.ok) throw new Error(res.status);
+                  bytes = new Uint8Array(await res.arrayBuffer()); }
+            catch (err) { // fall back to the HTMX chunk endpoint for this offset
+                this.htmlChunks.add(htmlPath); trigger.remove();
+                htmx.ajax('GET', htmlPath, {target: '#grid-container', swap: 'beforeend', headers: {'X-Client-Id': this.clientId}}); return; }
+            const end = Math.min(offset + this.chunk, this.total), frag = document.createDocumentFragment();
+            for (let i = offset; i < end; i++) { const cb = document.createElement('input'), k = i - offset;
+                cb.type = 'checkbox'; cb.id = `cb-${i}`; cb.className = 'cb'; cb.dataset.i = i;
+                cb.checked = (bytes[k >> 3] >> (7 - (k & 7))) & 1; frag.appendChild(cb); }
+            const next = end < this.total ? document.createElement('span') : null;
+            if (next) { next.className = 'lazy-trigger'; frag.appendChild(next); }
+            trigger.replaceWith(frag);
+            document.dispatchEvent(new CustomEvent('grid:chunk-loaded', {detail: {offset}}));
+            if (next) { const io = new IntersectionObserver((entries) => {
+                if (entries[0].isIntersecting) { io.disconnect(); this.loadBits(end, next, htmlPath.replace(/\d+$/, end)); } });
+                io.observe(next); } },
+
+        // windowed viewport: only the visible rows exist in the DOM, bits are fetched per chunk on demand
+        initWindow() {
+            this.cell = 16; this.bits = new Map(); this.pending = new Set();
+            this.spacer = this.el.querySelector('.grid-spacer'); this.rows = this.el.querySelector('.grid-rows');
+            const layout = () => { this.cols = Math.max(1, Math.floor(this.spacer.clientWidth / this.cell));
+                const height = Math.ceil(this.total / this.cols) * this.cell; // 100M boxes would overflow the browser's max element height,
+                this.scale = Math.max(1, height / 1e7); // so big boards scroll a scaled-down spacer and map scrollTop back to rows
+                this.spacer.style.height = `${height / this.scale}px`; this.renderWindow(); };
+            let queued = false;
+            this.el.addEventListener('scroll', () => { if (queued) return; queued = true;
+                requestAnimationFrame(() => { queued = false; this.renderWindow(); }); }, {passive: true});
+            window.addEventListener('resize', layout); layout();
+            const jump = document.getElementById('jump-to');
+            const go = () => { const i = Math.min(Math.max(parseInt(jump.value) || 0, 0), this.total - 1);
+                this.focusIndex = i; this.el.scrollTop = Math.floor(i / this.cols) * this.cell / this.scale; this.renderWindow(); };
+            document.getElementById('jump-go').addEventListener('click', go);
+            jump.addEventListener('keydown', (e) => { if (e.key === 'Enter') go(); }); },
+
+        renderWindow() {
+            const top = this.el.scrollTop, firstRow = Math.max(0, Math.floor(top * this.scale / this.cell) - 2);
+            const start = firstRow * this.cols, end = Math.min(this.total, start + (Math.ceil(this.el.clientHeight / this.cell) + 4) * this.cols);
+            for (let off = start - start % this.chunk; off < end; off += this.chunk) if (!this.bits.has(off)) this.fetchWindowChunk(off);
+            let html = '';
+            for (let i = start; i < end; i++) { const v = this.bitAt(i);
+                html += `<input type="checkbox" id="cb-${i}" class="cb${i === this.focusIndex ? ' cb-focus' : ''}" data-i="${i}"` +
+                        `${v ? ' checked' : ''}${v === null ? ' disabled' : ''}>`; }
+            this.rows.style.transform = `translateY(${top + firstRow * this.cell - top * this.scale}px)`; this.rows.innerHTML = html; },
+
+        async fetchWindowChunk(off) {
+            if (this.pending.has(off)) return; this.pending.add(off);
+            try { const res = await fetch(`${this.prefix}/chunk-bits/${off}`, {headers: {'X-Client-Id': this.clientId}}); if (!res.ok) throw new Error(res.status);
+                  this.bits.set(off, new Uint8Array(await res.arrayBuffer()));
+                  if (this.bits.size > 64) { this.bits.delete(this.bits.keys().next().value); // bounded client memory: drop the oldest chunk
+                      fetch(`${this.prefix}/viewport/${this.clientId}`, { method: 'POST', headers: {'Content-Type': 'application/json'}, // ...and stop its diffs
+                          body: JSON.stringify({offsets: [...this.bits.keys()]}) }).catch(err => console.log('Viewport update failed:', err)); }
+                  document.dispatchEvent(new CustomEvent('grid:chunk-loaded', {detail: {offset: off}}));
+                  this.renderWindow(); }
+            catch (err) { console.log('Chunk load failed:', err); }
+            finally { this.pending.delete(off); } },
+
+        bitAt(i) { const off = i - i % this.chunk, bytes = this.bits.get(off); if (!bytes) return null;
+            const k = i - off; return (bytes[k >> 3] >> (7 - (k & 7))) & 1; },
+
+        setBit(i, v) { const off = i - i % this.chunk, bytes = this.bits?.get(off); if (!bytes) return;
+            const k = i - off; if (v) bytes[k >> 3] |= 0x80 >> (k & 7); else bytes[k >> 3] &= ~(0x80 >> (k & 7)); },
+
+        applyUpdate(data) { if (Array.isArray(data)) this.applyDiffs(data); else if (data.resync) this.resync(data); },
+
+        // too many missed diffs: reload the affected chunks' bits and re-apply them to the inputs on the page
+        resync(data) { if (!Array.isArray(data.resync)) { location.reload(); return; }
+            Promise.all(data.resync.map((off) => this.refreshChunk(off))).then(() => { if (this.bits) this.renderWindow(); })
+                .catch(() => location.reload()); },
+
+        async refreshChunk(off) {
+            const res = await fetch(`${this.prefix}/chunk-bits/${off}`, {headers: {'X-Client-Id': this.clientId}}); if (!res.ok) throw new Error(res.status);
+            const bytes = new Uint8Array(await res.arrayBuffer()), end = Math.min(off + this.chunk, this.total);
+            if (this.bits) this.bits.set(off, bytes);
+            for (let i = off; i < end; i++) { const cb = document.getElementById(`cb-${i}`), k = i - off;
+                if (cb) cb.checked = (bytes[k >> 3] >> (7 - (k & 7))) & 1; } },
+
+        applyDiffs(pairs) { for (const [i, v] of pairs) { this.setBit(i, v); const cb = document.getElementById(`cb-${i}`); if (cb) cb.checked = !!v; } },
+
+        applyStats(s) { const el = document.getElementById('stats'); if (!el) return;
+            el.querySelector('.status-checked').textContent = s.checked.toLocaleString('en-US');
+            el.querySelector('.status-unchecked').textContent = s.unchecked.toLocaleString('en-US'); } };
+
+    grid.init();
+"""